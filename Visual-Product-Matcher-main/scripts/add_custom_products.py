@@ -7,6 +7,10 @@ Usage: python scripts/add_custom_products.py
 import json
 from pathlib import Path
 
+from catalog_snapshot import publish_snapshot
+from columnar_catalog import ColumnarCatalog
+from lexical_index import build_catalog_indexes
+
 def load_existing_products():
     """Load existing products.json"""
     products_path = Path(__file__).parent.parent / 'public' / 'data' / 'products.json'
@@ -19,10 +23,9 @@ def load_existing_products():
 def save_products(products):
     """Save products to products.json"""
     products_path = Path(__file__).parent.parent / 'public' / 'data' / 'products.json'
-    products_path.parent.mkdir(parents=True, exist_ok=True)
     
-    with open(products_path, 'w') as f:
-        json.dump(products, f, indent=2)
+    publish_snapshot(products, indexes=build_catalog_indexes(products),
+                     catalog_path=products_path, verbose=False)
 
 def add_product_interactive():
     """Add a single product interactively"""
@@ -136,19 +139,14 @@ def show_stats():
         print("\n📭 No products in dataset")
         return
     
-    categories = {}
-    total_value = 0
-    
-    for p in products:
-        category = p.get('category', 'Unknown')
-        categories[category] = categories.get(category, 0) + 1
-        total_value += p.get('price', 0)
+    catalog = ColumnarCatalog.from_products(products)
+    categories = catalog.category_counts()
     
     print("\n" + "=" * 60)
     print("Dataset Statistics")
     print("=" * 60)
-    print(f"Total products: {len(products)}")
-    print(f"Average price: ${total_value / len(products):.2f}")
+    print(f"Total products: {len(catalog)}")
+    print(f"Average price: ${catalog.average_price():.2f}")
     print(f"\nProducts by category:")
     for cat, count in sorted(categories.items(), key=lambda x: -x[1]):
         print(f"  {cat}: {count}")
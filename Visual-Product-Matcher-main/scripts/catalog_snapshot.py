@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+Versioned, immutable catalog snapshots with atomic publish
+Each build (catalog, vectors, indexes) is written to a new directory
+under data/snapshots/, fsynced, checksummed in manifest.json and then
+published by atomically swapping the 'current' symlink. Snapshots live
+outside public/ so Vite never copies them into the deployed site.
+Readers keep serving the snapshot they opened until they refresh.
+Usage: python scripts/catalog_snapshot.py
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+
+DATA_DIR = Path(__file__).parent.parent / 'public' / 'data'
+CATALOG_PATH = DATA_DIR / 'products.json'
+STORE_DIR = Path(__file__).parent.parent / 'data'  # build artifacts, not served
+SNAPSHOTS_DIR = STORE_DIR / 'snapshots'
+KEEP_SNAPSHOTS = 5  # versions kept after each publish (the current one always stays)
+CURRENT_LINK = 'current'
+CURRENT_POINTER = 'CURRENT'  # fallback when symlinks are unavailable (Windows)
+
+def _fsync_dir(path):
+    """Flush a directory entry so renames inside it survive a crash"""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _sha256(path):
+    """Checksum a file in 1 MB chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def write_json_atomic(path, data, **dump_kwargs):
+    """
+    Write JSON to a temp file, fsync it and rename it over the target
+    Readers see either the old file or the new one, never a truncated file
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, **dump_kwargs)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+    _fsync_dir(path.parent)
+    return path
+
+def _version_name(version):
+    return f"v{version:06d}"
+
+def list_versions(root=SNAPSHOTS_DIR):
+    """Return all published snapshot versions, oldest first"""
+    root = Path(root)
+    if not root.exists():
+        return []
+    return sorted(int(d.name[1:]) for d in root.iterdir()
+                  if d.is_dir() and not d.is_symlink() and d.name[:1] == 'v' and d.name[1:].isdigit())
+
+def current_version(root=SNAPSHOTS_DIR):
+    """Return the version the 'current' pointer refers to, or None"""
+    root = Path(root)
+    link = root / CURRENT_LINK
+    if link.is_symlink():
+        return int(Path(os.readlink(link)).name[1:])
+
+    pointer = root / CURRENT_POINTER
+    if pointer.exists():
+        return int(pointer.read_text().strip()[1:])
+    return None
+
+def _swap_current(root, version):
+    """Atomically point 'current' at a snapshot directory"""
+    name = _version_name(version)
+    tmp_link = root / f".{CURRENT_LINK}.{os.getpid()}.tmp"
+
+    try:
+        if tmp_link.is_symlink():
+            tmp_link.unlink()
+        os.symlink(name, tmp_link, target_is_directory=True)
+        os.replace(tmp_link, root / CURRENT_LINK)
+    except OSError:
+        pointer_tmp = root / f".{CURRENT_POINTER}.{os.getpid()}.tmp"
+        with open(pointer_tmp, 'w') as f:
+            f.write(name)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(pointer_tmp, root / CURRENT_POINTER)
+
+    _fsync_dir(root)
+
+def _carry_forward(products, previous):
+    """
+    Remap the previous snapshot's arrays onto a new catalog
+
+    Row-aligned arrays (listed in the manifest's 'row_arrays') are matched by
+    product id. A row is carried only if the product's image is unchanged,
+    because otherwise its vector no longer describes it. Rows without a
+    carried vector get -1 in integer arrays and 0 elsewhere, so 'ids' == -1
+    marks products that still need an embedding. Other arrays (PCA basis,
+    centroids) are reused as they are.
+    Returns (arrays, row_arrays, missing_rows)
+    """
+    previous_rows = {p['id']: (row, p.get('image')) for row, p in enumerate(previous.products)}
+    # Rows that had no vector in the previous snapshot have nothing to carry
+    has_vector = (np.asarray(previous.array('ids')) >= 0 if previous.has_array('ids')
+                  else np.ones(len(previous.products), dtype=bool))
+    source = np.full(len(products), -1, dtype=np.int64)
+    for row, product in enumerate(products):
+        match = previous_rows.get(product['id'])
+        if match is not None and match[1] == product.get('image') and has_vector[match[0]]:
+            source[row] = match[0]
+    carried = source >= 0
+
+    row_arrays = previous.manifest.get('row_arrays', [])
+    arrays = {}
+    for name in previous.manifest['arrays']:
+        old = previous.array(name)
+        if name not in row_arrays:
+            arrays[name] = old
+            continue
+        fill = -1 if np.issubdtype(old.dtype, np.integer) else 0
+        new = np.full((len(products),) + old.shape[1:], fill, dtype=old.dtype)
+        new[carried] = old[source[carried]]
+        arrays[name] = new
+
+    return arrays, row_arrays, int((~carried).sum())
+
+def publish_snapshot(products, arrays=None, indexes=None, row_arrays=(), catalog_path=CATALOG_PATH,
+                     root=SNAPSHOTS_DIR, carry_forward=True, keep=KEEP_SNAPSHOTS, verbose=True):
+    """
+    Write a complete build into a new versioned snapshot and publish it
+
+    products:   list of product dicts (written as products.json)
+    arrays:     {name: ndarray} saved as <name>.npy (embeddings, reduced vectors...)
+    indexes:    {name: JSON-serializable object} saved as <name>.json
+    row_arrays: names in arrays with one row per product, in catalog order
+
+    A catalog-only publish (no arrays) carries the current snapshot's arrays
+    forward by product id, so editing the catalog never drops the vectors.
+    Products that gained no vector are counted in the manifest's
+    'missing_vectors' and reported, instead of being silently misaligned.
+
+    The public catalog at catalog_path is replaced atomically as well, so
+    the frontend never reads a half-written products.json. Only the newest
+    `keep` versions are retained (None keeps everything).
+    """
+    indexes = indexes or {}
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    row_arrays = list(row_arrays)
+    missing = 0
+
+    previous = open_snapshot(root=root)
+    if not arrays and carry_forward and previous is not None and previous.manifest['arrays']:
+        arrays, row_arrays, missing = _carry_forward(products, previous)
+    arrays = arrays or {}
+
+    for name in row_arrays:
+        if len(arrays[name]) != len(products):
+            raise ValueError(f"Array '{name}' has {len(arrays[name])} rows for {len(products)} products")
+
+    version = max(list_versions(root), default=0) + 1
+    final_dir = root / _version_name(version)
+    build_dir = root / f".{_version_name(version)}.{os.getpid()}.tmp"
+    build_dir.mkdir()
+
+    try:
+        files = {'products.json': products}
+        files.update({f"{name}.json": index for name, index in indexes.items()})
+        for filename, data in files.items():
+            with open(build_dir / filename, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+
+        reused = {}
+        for name, array in arrays.items():
+            filename = f"{name}.npy"
+            # Unchanged arrays from the previous snapshot are hard-linked, not rewritten
+            if previous is not None and array is previous._arrays.get(name):
+                try:
+                    os.link(previous.path / filename, build_dir / filename)
+                    reused[filename] = previous.manifest['files'][filename]
+                    continue
+                except OSError:
+                    pass
+            with open(build_dir / filename, 'wb') as f:
+                np.save(f, np.ascontiguousarray(array))
+                f.flush()
+                os.fsync(f.fileno())
+
+        manifest = {
+            'version': version,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'num_products': len(products),
+            'arrays': sorted(arrays.keys()),
+            'row_arrays': sorted(row_arrays),
+            'missing_vectors': missing,
+            'indexes': sorted(indexes.keys()),
+            'files': {
+                p.name: reused.get(p.name) or {'sha256': _sha256(p), 'bytes': p.stat().st_size}
+                for p in sorted(build_dir.iterdir())
+            },
+        }
+        write_json_atomic(build_dir / 'manifest.json', manifest, indent=2)
+        _fsync_dir(build_dir)
+
+        os.rename(build_dir, final_dir)
+    except BaseException:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+
+    _fsync_dir(root)
+    _swap_current(root, version)
+    if keep:
+        prune_snapshots(keep, root)
+
+    if catalog_path is not None:
+        write_json_atomic(catalog_path, products, indent=2, ensure_ascii=False)
+
+    if verbose:
+        print(f"📦 Published snapshot {_version_name(version)} ({len(products)} products)")
+    if missing:
+        print(f"⚠️  {missing} product(s) have no embedding yet (ids == -1 in the snapshot); "
+              f"run save_embeddings to rebuild the vectors")
+    return final_dir
+
+class Snapshot:
+    """
+    Read-only view of one published snapshot
+
+    Every file is opened (arrays memory-mapped) when the snapshot is
+    opened, so a reader keeps a complete, consistent view even after newer
+    snapshots are published and this one is pruned: open handles and maps
+    outlive the deleted directory. JSON is still parsed on first use.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / 'manifest.json', 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        self.version = self.manifest['version']
+        self._products = None
+        self._json_files = {name: open(self.path / f"{name}.json", 'rb')
+                            for name in ['products'] + self.manifest['indexes']}
+        self._arrays = {name: np.load(self.path / f"{name}.npy", mmap_mode='r')
+                        for name in self.manifest['arrays']}
+
+    def _read_json(self, name):
+        f = self._json_files[name]
+        f.seek(0)
+        return json.loads(f.read().decode('utf-8'))
+
+    @property
+    def products(self):
+        if self._products is None:
+            self._products = self._read_json('products')
+        return self._products
+
+    def has_array(self, name):
+        return name in self.manifest['arrays']
+
+    def missing_vectors(self):
+        """Number of products without an embedding in this snapshot"""
+        return self.manifest.get('missing_vectors', 0)
+
+    def array(self, name):
+        """A stored array, memory-mapped when the snapshot was opened"""
+        if name not in self._arrays:
+            raise KeyError(f"Snapshot {_version_name(self.version)} has no array '{name}'")
+        return self._arrays[name]
+
+    def index(self, name):
+        """Load a stored JSON index"""
+        if name not in self._json_files:
+            raise KeyError(f"Snapshot {_version_name(self.version)} has no index '{name}'")
+        return self._read_json(name)
+
+    def verify(self):
+        """Recompute checksums; returns the list of corrupt or missing files"""
+        bad = []
+        for filename, meta in self.manifest['files'].items():
+            file_path = self.path / filename
+            if not file_path.exists() or _sha256(file_path) != meta['sha256']:
+                bad.append(filename)
+        return bad
+
+def open_snapshot(version=None, root=SNAPSHOTS_DIR):
+    """Open a specific snapshot version, or the current one; None if none published"""
+    version = current_version(root) if version is None else version
+    if version is None:
+        return None
+    return Snapshot(Path(root) / _version_name(version))
+
+class SnapshotReader:
+    """
+    Holds one snapshot for serving and switches only when asked
+
+        reader = SnapshotReader()
+        ... serve from reader.snapshot ...
+        reader.refresh()  # pick up a newer publish, if any
+    """
+
+    def __init__(self, root=SNAPSHOTS_DIR):
+        self.root = Path(root)
+        self.snapshot = open_snapshot(root=self.root)
+
+    def refresh(self):
+        """Switch to the current snapshot; returns True if the version changed"""
+        version = current_version(self.root)
+        if version is None or (self.snapshot and self.snapshot.version == version):
+            return False
+        self.snapshot = open_snapshot(version, self.root)
+        return True
+
+def prune_snapshots(keep=KEEP_SNAPSHOTS, root=SNAPSHOTS_DIR):
+    """
+    Delete old snapshots, always keeping the current one
+    Readers that opened a deleted snapshot keep working on POSIX. Where open
+    files cannot be deleted (Windows) the snapshot is left for a later prune.
+    """
+    current = current_version(root)
+    versions = list_versions(root)
+    removed = []
+    for version in versions[:-keep] if keep else versions:
+        if version == current:
+            continue
+        try:
+            shutil.rmtree(Path(root) / _version_name(version))
+            removed.append(version)
+        except OSError as e:
+            print(f"⚠️  Could not remove {_version_name(version)} (still in use?): {e}")
+    return removed
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Visual Product Matcher - Catalog Snapshots")
+    print("=" * 60)
+    print("\nOptions:")
+    print("1. List snapshots")
+    print("2. Verify current snapshot checksums")
+    print("3. Roll back to a previous snapshot")
+    print("4. Prune old snapshots")
+
+    choice = input("\nEnter choice (1-4) [1]: ").strip() or "1"
+
+    if choice == "1":
+        current = current_version()
+        for version in list_versions():
+            snapshot = open_snapshot(version)
+            marker = "→" if version == current else " "
+            print(f" {marker} {_version_name(version)}  {snapshot.manifest['created']}  "
+                  f"{snapshot.manifest['num_products']} products  "
+                  f"arrays: {', '.join(snapshot.manifest['arrays']) or '-'}")
+    elif choice == "2":
+        snapshot = open_snapshot()
+        if snapshot is None:
+            print("📭 No snapshot published yet")
+        else:
+            bad = snapshot.verify()
+            if bad:
+                print(f"❌ {_version_name(snapshot.version)} has bad files: {', '.join(bad)}")
+            else:
+                print(f"✅ {_version_name(snapshot.version)} checksums OK")
+    elif choice == "3":
+        version = int(input("Version number to publish: ").strip())
+        if version not in list_versions():
+            print(f"❌ Unknown version: {version}")
+        else:
+            _swap_current(SNAPSHOTS_DIR, version)
+            write_json_atomic(CATALOG_PATH, open_snapshot(version).products, indent=2, ensure_ascii=False)
+            print(f"✅ Current snapshot is now {_version_name(version)}")
+    elif choice == "4":
+        keep = int(input(f"Snapshots to keep [{KEEP_SNAPSHOTS}]: ").strip() or KEEP_SNAPSHOTS)
+        removed = prune_snapshots(keep)
+        print(f"🗑️  Removed {len(removed)} snapshot(s)")
+    else:
+        print("❌ Invalid choice")
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Category-centroid query routing
+Each category gets a centroid embedding (large categories are split into
+k-means sub-clusters). A query is scored against the centroids first and
+only the products in the closest partitions are searched, with a fallback
+to a full scan when the centroid scores are too close to call.
+Usage: python scripts/category_router.py
+"""
+
+import time
+
+import numpy as np
+
+from catalog_snapshot import open_snapshot
+from embedding_store import (
+    load_catalog, load_embeddings, load_vector_ids, normalize_rows, top_k, synthetic_embeddings,
+)
+
+SUBCLUSTER_SIZE = 20_000   # categories larger than this are split into sub-clusters
+MAX_SUBCLUSTERS = 16
+DEFAULT_TOP_N = 3          # partitions searched per query
+DEFAULT_MARGIN = 0.02      # fall back to a full scan if an excluded partition is this close to the best
+
+def category_centroids(category_rows, embeddings):
+    """Normalized mean embedding per category, in category_rows order"""
+    return normalize_rows(np.stack([
+        np.asarray(embeddings[rows]).mean(axis=0) for rows in category_rows.values()
+    ]))
+
+def spherical_kmeans(vectors, k, iterations=10, sample=50_000, seed=0):
+    """Cosine k-means; fitted on a sample, then every vector is assigned"""
+    rng = np.random.default_rng(seed)
+    fit = vectors[rng.choice(len(vectors), min(sample, len(vectors)), replace=False)]
+    centers = fit[rng.choice(len(fit), k, replace=False)]
+
+    for _ in range(iterations):
+        labels = np.argmax(fit @ centers.T, axis=1)
+        for c in range(k):
+            members = fit[labels == c]
+            if len(members):
+                centers[c] = members.mean(axis=0)
+        centers = normalize_rows(centers)
+
+    return centers, np.argmax(vectors @ centers.T, axis=1)
+
+def build_router_arrays(products, embeddings, subcluster_size=SUBCLUSTER_SIZE):
+    """
+    Partition the catalog by category (and sub-cluster) for a snapshot
+    'route_partition' is row-aligned with the catalog; the centroids and
+    their category names (a fixed-width string array) are global
+    """
+    by_category = {}
+    for row, product in enumerate(products):
+        by_category.setdefault(product.get('category', 'Unknown'), []).append(row)
+
+    centroids, partition_categories = [], []
+    partition = np.empty(len(products), dtype=np.int32)
+    for category, rows in by_category.items():
+        rows = np.array(rows)
+        vectors = normalize_rows(embeddings[rows])
+        k = min(MAX_SUBCLUSTERS, -(-len(rows) // subcluster_size))
+        if k > 1:
+            centers, labels = spherical_kmeans(vectors, k)
+        else:
+            centers, labels = normalize_rows(vectors.mean(axis=0, keepdims=True)), np.zeros(len(rows), int)
+
+        partition[rows] = len(centroids) + labels
+        centroids.extend(centers)
+        partition_categories.extend([category] * len(centers))
+
+    return {
+        'route_centroids': np.array(centroids, dtype=np.float32),
+        'route_categories': np.array(partition_categories, dtype=str),
+        'route_partition': partition,
+    }
+
+class CategoryRouter:
+    """
+    Route queries to the closest category partitions before scoring products
+    Embeddings are expected L2-normalized, as save_embeddings stores them
+
+        router = CategoryRouter.from_catalog(products, embeddings)
+        rows, scores, stats = router.search(query, k=10, top_n=3)
+    """
+
+    def __init__(self, embeddings, centroids, partition, partition_categories):
+        self.embeddings = embeddings
+        self.centroids = np.asarray(centroids)
+        self.partition_categories = partition_categories
+        # Rows without an embedding have partition -1 and are never routed to
+        order = np.argsort(partition, kind='stable')
+        bounds = np.searchsorted(partition[order], np.arange(len(centroids) + 1))
+        self.partition_rows = [order[bounds[p]:bounds[p + 1]] for p in range(len(centroids))]
+        self.unrouted = np.flatnonzero(partition < 0)
+        self.num_rows = len(partition)
+
+    def full_scores(self, query):
+        """Scores for every row; rows without an embedding score -inf"""
+        scores = np.asarray(self.embeddings) @ query
+        scores[self.unrouted] = -np.inf
+        return scores
+
+    @classmethod
+    def from_catalog(cls, products, embeddings, subcluster_size=SUBCLUSTER_SIZE):
+        arrays = build_router_arrays(products, embeddings, subcluster_size)
+        return cls(embeddings, arrays['route_centroids'], arrays['route_partition'],
+                   arrays['route_categories'].tolist())
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        return cls(snapshot.array('embeddings'), snapshot.array('route_centroids'),
+                   np.asarray(snapshot.array('route_partition')), snapshot.array('route_categories').tolist())
+
+    def route(self, query, top_n=DEFAULT_TOP_N, margin=DEFAULT_MARGIN):
+        """
+        Pick the partitions to search
+
+        Returns (partitions, fallback). fallback is True when the best
+        excluded partition scores within margin of the best partition, i.e.
+        the centroids do not clearly separate the query; the caller should
+        then scan everything.
+        """
+        scores = self.centroids @ query
+        order = np.argsort(-scores)
+        chosen = order[:top_n]
+        ambiguous = len(order) > top_n and scores[order[0]] - scores[order[top_n]] < margin
+        return chosen, bool(ambiguous)
+
+    def search(self, query, k=10, top_n=DEFAULT_TOP_N, margin=DEFAULT_MARGIN):
+        """Return (rows, similarities, stats) for the top-k products"""
+        start = time.perf_counter()
+        query = normalize_rows(query).reshape(-1)
+        partitions, fallback = self.route(query, top_n, margin)
+
+        if fallback:
+            rows = np.arange(self.num_rows)
+            scores = self.full_scores(query)
+        else:
+            rows = np.sort(np.concatenate([self.partition_rows[p] for p in partitions]))
+            scores = np.asarray(self.embeddings[rows]) @ query
+
+        best, best_scores = top_k(scores, k)
+        keep = best_scores > -np.inf
+        best, best_scores = best[keep], best_scores[keep]
+        stats = {
+            'categories': sorted({self.partition_categories[p] for p in partitions}),
+            'fallback': fallback,
+            'scanned': len(rows),
+            'scanned_fraction': len(rows) / max(self.num_rows, 1),
+            'total_ms': (time.perf_counter() - start) * 1000,
+        }
+        return rows[best], best_scores, stats
+
+def evaluate_routing(router, queries, k=10, top_ns=(1, 2, 3, 5), margins=(0.0, DEFAULT_MARGIN, 0.05)):
+    """Report scanned fraction, fallback rate, recall@k and latency for each setting"""
+    queries = normalize_rows(queries)
+    start = time.perf_counter()
+    truth = [set(top_k(router.full_scores(q), k)[0].tolist()) for q in queries]
+    full_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    print(f"\n⏱️  Routing: {router.num_rows} products, {len(router.centroids)} partitions, "
+          f"{len(queries)} queries, k={k}")
+    print(f"Full scan: {full_ms:.2f} ms/query")
+    print(f"{'Top-N':>6} {'Margin':>7} {'Scanned':>8} {'Fallback':>9} {'ms/query':>9} {'Recall':>7}")
+
+    report = []
+    for top_n in top_ns:
+        for margin in margins:
+            scanned, fallbacks, total_ms, recall = 0.0, 0, 0.0, 0.0
+            for query, expected in zip(queries, truth):
+                rows, _, stats = router.search(query, k, top_n, margin)
+                scanned += stats['scanned_fraction']
+                fallbacks += stats['fallback']
+                total_ms += stats['total_ms']
+                recall += len(expected & set(rows.tolist())) / k
+
+            n = len(queries)
+            report.append({'top_n': top_n, 'margin': margin, 'scanned_fraction': scanned / n,
+                           'fallback_rate': fallbacks / n, 'ms': total_ms / n, 'recall': recall / n})
+            print(f"{top_n:>6} {margin:>7.2f} {scanned / n:>7.1%} {fallbacks / n:>8.1%} "
+                  f"{total_ms / n:>9.2f} {recall / n:>6.1%}")
+
+    return report
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Visual Product Matcher - Category Routing")
+    print("=" * 60)
+    print("\nOptions:")
+    print("1. Evaluate routing on catalog embeddings")
+    print("2. Evaluate routing on synthetic data")
+
+    choice = input("\nEnter choice (1-2) [2]: ").strip() or "2"
+
+    if choice == "1":
+        products = load_catalog()
+        embeddings = load_embeddings()
+        if embeddings is None or len(embeddings) != len(products):
+            print("❌ No embeddings matching the current catalog")
+            exit(1)
+        # Reuse the routing table save_embeddings stored instead of re-running k-means
+        snapshot = open_snapshot()
+        if snapshot is not None and snapshot.has_array('route_centroids'):
+            router = CategoryRouter.from_snapshot(snapshot)
+        else:
+            router = CategoryRouter.from_catalog(products, embeddings)
+        with_vectors = np.flatnonzero(load_vector_ids(products) >= 0)
+        sample = np.random.default_rng(0).choice(with_vectors, min(200, len(with_vectors)), replace=False)
+        evaluate_routing(router, np.asarray(embeddings)[sample])
+    elif choice == "2":
+        embeddings, labels = synthetic_embeddings(200_000)
+        products = [{'category': f"Category {label // 2}"} for label in labels]
+        router = CategoryRouter.from_catalog(products, embeddings, subcluster_size=2_000)
+        queries = embeddings[np.random.default_rng(0).integers(0, len(embeddings), 200)]
+        evaluate_routing(router, queries)
+    else:
+        print("❌ Invalid choice")
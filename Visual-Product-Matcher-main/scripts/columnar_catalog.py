@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Compact columnar in-memory catalog shared by the dataset scripts
+Instead of one dict per product, columns are stored as NumPy arrays:
+ids and prices as numeric arrays, category and source as int16 codes into
+small lookup tables, and names and image URLs as spans into one UTF-8
+string arena. Stats and filtering work on whole columns at once.
+"""
+
+from array import array
+
+import numpy as np
+
+MISSING = -1  # code used when a product has no category or source
+DEDUPE_CHUNK = 20_000  # rows whose names are hashed or compared at once
+HASH_MULTIPLIER = np.uint64(1099511628211)  # FNV prime, for the name hash
+GROUP_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)  # spreads (category, length) over the hash bits
+
+def _narrow(codes, table):
+    """int16 codes while the table fits, int32 beyond 32767 distinct values"""
+    return codes.astype(np.int16) if len(table) <= np.iinfo(np.int16).max else codes
+
+def _encode(values, table, lookup):
+    """Dictionary-encode strings into int16/int32 codes, extending the table"""
+    codes = np.empty(len(values), dtype=np.int32)
+    for i, value in enumerate(values):
+        if value is None:
+            codes[i] = MISSING
+            continue
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(table)
+            table.append(value)
+        codes[i] = code
+    return _narrow(codes, table)
+
+def _decode(code, table):
+    return None if code == MISSING else table[code]
+
+class CatalogBuilder:
+    """
+    Append products straight into columns, without building dicts first
+
+        builder = CatalogBuilder()
+        builder.append(1, "Nike Shoes", "Fashion", 150.0, "/images/shoes.jpg", source="kaggle")
+        catalog = builder.build()
+    """
+
+    def __init__(self):
+        self.ids = array('q')
+        self.prices = array('d')
+        self.category_codes = array('i')
+        self.source_codes = array('i')
+        self.categories, self._category_lookup = [], {}
+        self.sources, self._source_lookup = [], {}
+        self.arena = bytearray()
+        self.name_starts, self.name_lengths = array('q'), array('I')
+        self.image_starts, self.image_lengths = array('q'), array('I')
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def _code(value, table, lookup):
+        if value is None:
+            return MISSING
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(table)
+            table.append(value)
+        return code
+
+    def _span(self, text):
+        data = str(text).encode('utf-8')
+        start = len(self.arena)
+        self.arena += data
+        return start, len(data)
+
+    def append(self, product_id, name, category, price, image, source=None):
+        self.ids.append(product_id)
+        self.prices.append(float(price or 0))
+        self.category_codes.append(self._code(category, self.categories, self._category_lookup))
+        self.source_codes.append(self._code(source, self.sources, self._source_lookup))
+        start, length = self._span(name)
+        self.name_starts.append(start)
+        self.name_lengths.append(length)
+        start, length = self._span(image)
+        self.image_starts.append(start)
+        self.image_lengths.append(length)
+
+    def build(self):
+        """Freeze the appended rows into a ColumnarCatalog"""
+        column = lambda values, dtype: np.frombuffer(values, dtype=dtype).copy()
+        return ColumnarCatalog(
+            column(self.ids, np.int64), column(self.prices, np.float64),
+            _narrow(column(self.category_codes, np.int32), self.categories), self.categories,
+            _narrow(column(self.source_codes, np.int32), self.sources), self.sources,
+            bytes(self.arena),
+            column(self.name_starts, np.int64), column(self.name_lengths, np.uint32),
+            column(self.image_starts, np.int64), column(self.image_lengths, np.uint32),
+        )
+
+class ColumnarCatalog:
+    """
+    Column-oriented product catalog
+
+        catalog = ColumnarCatalog.from_products(products)
+        catalog.category_counts()
+        unique = catalog.dedupe()
+        products = unique.to_products(include_source=False)
+    """
+
+    def __init__(self, ids, prices, category_codes, categories, source_codes, sources,
+                 arena, name_starts, name_lengths, image_starts, image_lengths):
+        self.ids = ids                        # int64
+        self.prices = prices                  # float64
+        self.category_codes = category_codes  # int16 (int32 if >32767 values) -> categories
+        self.categories = categories          # list of category names
+        self.source_codes = source_codes      # int16/int32 -> sources, MISSING if absent
+        self.sources = sources                # list of source names
+        self.arena = arena                    # bytes, UTF-8 names and image URLs
+        self.name_starts = name_starts        # int64 offsets into arena
+        self.name_lengths = name_lengths      # uint32 byte lengths
+        self.image_starts = image_starts
+        self.image_lengths = image_lengths
+
+    @classmethod
+    def from_products(cls, products):
+        """Build from a list of product dicts (a ColumnarCatalog is returned as is)"""
+        if isinstance(products, cls):
+            return products
+
+        n = len(products)
+        categories, sources = [], []
+        category_codes = _encode([p.get('category', 'Unknown') for p in products], categories, {})
+        source_codes = _encode([p.get('source') for p in products], sources, {})
+
+        chunks = []
+        offset = 0
+        name_starts = np.empty(n, dtype=np.int64)
+        name_lengths = np.empty(n, dtype=np.uint32)
+        image_starts = np.empty(n, dtype=np.int64)
+        image_lengths = np.empty(n, dtype=np.uint32)
+        for i, p in enumerate(products):
+            name = str(p.get('name', '')).encode('utf-8')
+            image = str(p.get('image', '')).encode('utf-8')
+            name_starts[i], name_lengths[i] = offset, len(name)
+            image_starts[i], image_lengths[i] = offset + len(name), len(image)
+            chunks.append(name)
+            chunks.append(image)
+            offset += len(name) + len(image)
+
+        return cls(
+            np.fromiter((p['id'] for p in products), dtype=np.int64, count=n),
+            np.fromiter((float(p.get('price') or 0) for p in products), dtype=np.float64, count=n),
+            category_codes, categories, source_codes, sources,
+            b''.join(chunks), name_starts, name_lengths, image_starts, image_lengths,
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _string(self, start, length):
+        return self.arena[start:start + length].decode('utf-8')
+
+    def name(self, i):
+        return self._string(self.name_starts[i], self.name_lengths[i])
+
+    def image(self, i):
+        return self._string(self.image_starts[i], self.image_lengths[i])
+
+    def product(self, i, include_source=True):
+        """Materialize one row as a product dict"""
+        product = {
+            'id': int(self.ids[i]),
+            'name': self.name(i),
+            'category': _decode(self.category_codes[i], self.categories),
+            'price': float(self.prices[i]),
+            'image': self.image(i),
+        }
+        if include_source and self.source_codes[i] != MISSING:
+            product['source'] = _decode(self.source_codes[i], self.sources)
+        return product
+
+    def to_products(self, include_source=True):
+        """Materialize the catalog as product dicts (e.g. to write JSON)"""
+        return [self.product(i, include_source) for i in range(len(self))]
+
+    def nbytes(self):
+        """Approximate memory held by the columns"""
+        arrays = (self.ids, self.prices, self.category_codes, self.source_codes,
+                  self.name_starts, self.name_lengths, self.image_starts, self.image_lengths)
+        return sum(a.nbytes for a in arrays) + len(self.arena)
+
+    # ---- vectorized stats ----
+
+    def _counts(self, codes, table):
+        present = codes[codes != MISSING]
+        counts = np.bincount(present, minlength=len(table))
+        result = {table[code]: int(count) for code, count in enumerate(counts) if count}
+        missing = int((codes == MISSING).sum())
+        if missing:
+            result['Unknown'] = result.get('Unknown', 0) + missing
+        return result
+
+    def category_counts(self):
+        return self._counts(self.category_codes, self.categories)
+
+    def source_counts(self):
+        return self._counts(self.source_codes, self.sources)
+
+    def average_price(self):
+        return float(self.prices.mean()) if len(self) else 0.0
+
+    # ---- filtering and dedupe ----
+
+    def take(self, rows):
+        """New catalog with the given rows; the string arena is shared, not copied"""
+        return ColumnarCatalog(
+            self.ids[rows], self.prices[rows], self.category_codes[rows], self.categories,
+            self.source_codes[rows], self.sources, self.arena,
+            self.name_starts[rows], self.name_lengths[rows],
+            self.image_starts[rows], self.image_lengths[rows],
+        )
+
+    def filter(self, category=None, min_price=None, max_price=None):
+        """Rows matching a category and/or price range"""
+        mask = np.ones(len(self), dtype=bool)
+        if category is not None:
+            code = self.categories.index(category) if category in self.categories else MISSING - 1
+            mask &= self.category_codes == code
+        if min_price is not None:
+            mask &= self.prices >= min_price
+        if max_price is not None:
+            mask &= self.prices <= max_price
+        return self.take(np.flatnonzero(mask))
+
+    def _span_bytes(self, starts, lengths, fold):
+        """
+        Spans as a zero-padded (longest, rows) uint8 matrix, byte position
+        first so each position is one contiguous row; ASCII-lowercased if fold
+        """
+        arena = np.frombuffer(self.arena, dtype=np.uint8)
+        width = int(lengths.max()) if len(lengths) else 0
+        offsets = np.arange(width)[:, None]
+        if not len(arena):
+            return np.zeros((width, len(starts)), dtype=np.uint8)
+        data = arena.take(offsets + starts, mode='clip')
+        data[offsets >= lengths] = 0
+        if fold:
+            data += ((data >= ord('A')) & (data <= ord('Z'))).view(np.uint8) << 5
+        return data
+
+    def _hash_names(self, fold, chunk=DEDUPE_CHUNK):
+        """64-bit polynomial hash of every (optionally folded) name, chunk rows at a time"""
+        hashes = np.empty(len(self), dtype=np.uint64)
+        for start in range(0, len(self), chunk):
+            end = min(start + chunk, len(self))
+            h = np.zeros(end - start, dtype=np.uint64)
+            for position in self._span_bytes(self.name_starts[start:end], self.name_lengths[start:end], fold):
+                h *= HASH_MULTIPLIER  # wraps mod 2**64
+                h += position
+            hashes[start:end] = h
+        return hashes
+
+    def _same_names(self, rows, others, fold, chunk=DEDUPE_CHUNK):
+        """Byte-exact comparison of the names at rows and others"""
+        same = self.name_lengths[rows] == self.name_lengths[others]
+        for start in range(0, len(rows), chunk):
+            a, b = rows[start:start + chunk], others[start:start + chunk]
+            same[start:start + chunk] &= (
+                self._span_bytes(self.name_starts[a], self.name_lengths[a], fold)
+                == self._span_bytes(self.name_starts[b], self.name_lengths[b], fold)
+            ).all(axis=0)
+        return same
+
+    def dedupe(self, case_sensitive=False, renumber=True):
+        """
+        Keep the first product for each (name, category) pair
+
+        Rows are grouped by a 64-bit key mixing the name hash, name length
+        and category, with one stable sort over whole columns. Every row
+        merged into a group is then compared byte-for-byte (and by category)
+        with the group's first row, so a hash collision can never drop a
+        distinct product; the few colliding rows are deduped on their
+        strings instead. Without case_sensitive, ASCII letters in names and
+        whole category names are lowercased before comparing.
+        """
+        fold = not case_sensitive
+        folded = {}
+        # Extra trailing slot so MISSING (-1) codes get a key of their own
+        category_keys = np.array([folded.setdefault(c if case_sensitive else c.lower(), len(folded))
+                                  for c in self.categories] + [-1], dtype=np.int64)[self.category_codes]
+
+        # One uint64 key per row: the name hash mixed with category and length
+        group = ((category_keys + 1) << 32 | self.name_lengths.astype(np.int64)).view(np.uint64)
+        keys = self._hash_names(fold) ^ (group * GROUP_MULTIPLIER)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        boundary = np.ones(len(order), dtype=bool)
+        boundary[1:] = sorted_keys[1:] != sorted_keys[:-1]
+
+        # The stable sort puts each group's earliest row first
+        first = order[boundary][np.cumsum(boundary) - 1]
+        merged = np.flatnonzero(first != order)
+        rows, representatives = order[merged], first[merged]
+        same = category_keys[rows] == category_keys[representatives]
+        same &= self._same_names(rows, representatives, fold)
+        collided = np.sort(rows[~same])
+
+        # Real hash collisions are vanishingly rare; dedupe those rows exactly
+        distinct = {}
+        for row in collided.tolist():
+            start = int(self.name_starts[row])
+            name = self.arena[start:start + int(self.name_lengths[row])]
+            distinct.setdefault((name.lower() if fold else name, int(category_keys[row])), row)
+        keep = np.sort(np.concatenate([order[boundary], np.array(list(distinct.values()), dtype=np.int64)]))
+        unique = self.take(keep)
+
+        if renumber:
+            unique.ids = np.arange(1, len(unique) + 1, dtype=np.int64)
+        return unique
@@ -14,6 +14,10 @@ import requests
 from PIL import Image
 from io import BytesIO
 
+from catalog_snapshot import publish_snapshot, write_json_atomic
+from columnar_catalog import ColumnarCatalog
+from lexical_index import build_catalog_indexes
+
 def download_dataset():
     """Download the Kaggle dataset"""
     print("Downloading dataset from Kaggle...")
@@ -124,10 +128,8 @@ def convert_to_products_json(dataset_path, output_path="public/data/products.jso
     
     # Save to JSON
     output_file = Path(output_path)
-    output_file.parent.mkdir(parents=True, exist_ok=True)
     
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(products, f, indent=2, ensure_ascii=False)
+    write_json_atomic(output_file, products, indent=2, ensure_ascii=False)
     
     print(f"\n✅ Successfully converted {len(products)} products")
     print(f"📄 Saved to: {output_file}")
@@ -135,9 +137,7 @@ def convert_to_products_json(dataset_path, output_path="public/data/products.jso
     print(json.dumps(products[0], indent=2))
     
     # Print category summary
-    categories = {}
-    for p in products:
-        categories[p['category']] = categories.get(p['category'], 0) + 1
+    categories = ColumnarCatalog.from_products(products).category_counts()
     
     print(f"\n📦 Categories found: {len(categories)}")
     for cat, count in sorted(categories.items(), key=lambda x: x[1], reverse=True)[:10]:
@@ -181,10 +181,8 @@ def convert_from_images_only(dataset_path, image_dirs, output_path):
     
     # Save to JSON
     output_file = Path(output_path)
-    output_file.parent.mkdir(parents=True, exist_ok=True)
     
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(products, f, indent=2, ensure_ascii=False)
+    write_json_atomic(output_file, products, indent=2, ensure_ascii=False)
     
     print(f"✅ Created {len(products)} products from images")
     print(f"📄 Saved to: {output_file}")
@@ -233,6 +231,9 @@ def main():
         print("\n❌ Conversion failed. Please check the dataset structure.")
         return
     
+    # products.json is already written; record the build as a snapshot too
+    publish_snapshot(products, indexes=build_catalog_indexes(products), catalog_path=None)
+    
     # Step 3: Optional - Copy images to public folder
     csv_files, image_dirs = find_dataset_files(dataset_path)
     
@@ -332,17 +333,15 @@ if __name__ == "__main__":
             products = merge_multiple_datasets()
             if products:
                 output_path = Path("public/data/products.json")
-                output_path.parent.mkdir(parents=True, exist_ok=True)
-                with open(output_path, 'w') as f:
-                    json.dump(products, f, indent=2)
+                publish_snapshot(products, indexes=build_catalog_indexes(products),
+                                 catalog_path=output_path)
                 print(f"\n✅ Merged {len(products)} products")
                 print(f"📁 Saved to: {output_path}")
         elif choice == "3":
             products = add_sample_products()
             output_path = Path("public/data/products.json")
-            output_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(output_path, 'w') as f:
-                json.dump(products, f, indent=2)
+            publish_snapshot(products, indexes=build_catalog_indexes(products),
+                             catalog_path=output_path)
             print(f"\n✅ Generated {len(products)} sample products")
             print(f"📁 Saved to: {output_path}")
         elif choice == "4":
@@ -358,19 +357,10 @@ if __name__ == "__main__":
             all_products = kaggle_products + sample_products
             
             # Remove duplicates
-            seen = set()
-            unique = []
-            for p in all_products:
-                key = f"{p['name']}_{p['category']}"
-                if key not in seen:
-                    seen.add(key)
-                    p['id'] = len(unique) + 1
-                    unique.append(p)
+            unique = ColumnarCatalog.from_products(all_products).dedupe(case_sensitive=True).to_products()
             
             output_path = Path("public/data/products.json")
-            output_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(output_path, 'w') as f:
-                json.dump(unique, f, indent=2)
+            publish_snapshot(unique, indexes=build_catalog_indexes(unique), catalog_path=output_path)
             
             print(f"\n✅ Created maximum dataset with {len(unique)} products")
             print(f"📁 Saved to: {output_path}")
@@ -5,12 +5,15 @@ Combines multiple sources for maximum ML training data
 """
 
 import kagglehub
-import json
 import requests
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 
+from catalog_snapshot import publish_snapshot
+from columnar_catalog import CatalogBuilder, ColumnarCatalog
+from lexical_index import build_catalog_indexes
+
 # Large Kaggle datasets for e-commerce/products
 RECOMMENDED_DATASETS = [
     "warcoder/visual-product-recognition",
@@ -38,16 +41,18 @@ def download_all_datasets():
     return downloaded_paths
 
 def process_all_datasets(downloaded_paths):
-    """Process all downloaded datasets into unified format"""
+    """Process all downloaded datasets into one columnar catalog"""
     import csv
     import random
     
-    all_products = []
+    # Rows go straight into columns; no per-product dicts are kept
+    builder = CatalogBuilder()
     current_id = 1
     
     for dataset_name, path in downloaded_paths:
         print(f"\n📊 Processing {dataset_name}...")
-        dataset_products = []
+        source = dataset_name.split('/')[1]
+        dataset_start = len(builder)
         
         # Try to find and parse CSV files
         for csv_file in Path(path).rglob("*.csv"):
@@ -90,100 +95,76 @@ def process_all_datasets(downloaded_paths):
                                 '')
                         
                         if image and name:
-                            dataset_products.append({
-                                'id': current_id,
-                                'name': name[:100],  # Truncate long names
-                                'category': category,
-                                'price': price,
-                                'image': image,
-                                'source': dataset_name.split('/')[1]
-                            })
+                            # Truncate long names
+                            builder.append(current_id, name[:100], category, price, image, source)
                             current_id += 1
                             
                             # Limit products per dataset to avoid memory issues
-                            if len(dataset_products) >= 500:
+                            if len(builder) - dataset_start >= 500:
                                 break
                 
-                if len(dataset_products) >= 500:
+                if len(builder) - dataset_start >= 500:
                     break
                     
             except Exception as e:
                 print(f"  ⚠️  Error processing {csv_file.name}: {e}")
         
         # If no CSV data, try images
-        if not dataset_products:
+        if len(builder) == dataset_start:
             for img_file in Path(path).rglob("*"):
                 if img_file.suffix.lower() in ['.jpg', '.jpeg', '.png', '.webp']:
                     category = img_file.parent.name
-                    dataset_products.append({
-                        'id': current_id,
-                        'name': img_file.stem.replace('_', ' ').replace('-', ' ').title()[:100],
-                        'category': category if category != 'images' else 'General',
-                        'price': round(random.uniform(10, 500), 2),
-                        'image': f"/images/{img_file.name}",
-                        'source': dataset_name.split('/')[1]
-                    })
+                    builder.append(
+                        current_id,
+                        img_file.stem.replace('_', ' ').replace('-', ' ').title()[:100],
+                        category if category != 'images' else 'General',
+                        round(random.uniform(10, 500), 2),
+                        f"/images/{img_file.name}",
+                        source,
+                    )
                     current_id += 1
                     
-                    if len(dataset_products) >= 500:
+                    if len(builder) - dataset_start >= 500:
                         break
         
-        print(f"  ✓ Extracted {len(dataset_products)} products")
-        all_products.extend(dataset_products)
+        print(f"  ✓ Extracted {len(builder) - dataset_start} products")
     
-    return all_products
+    return builder.build()
 
 def deduplicate_products(products):
     """Remove duplicate products based on name and category"""
-    seen = set()
-    unique = []
-    
-    for product in products:
-        key = f"{product['name'].lower()}_{product['category'].lower()}"
-        if key not in seen:
-            seen.add(key)
-            product['id'] = len(unique) + 1  # Re-assign IDs
-            unique.append(product)
-    
-    return unique
+    # Case-insensitive; IDs are re-assigned 1..N
+    return ColumnarCatalog.from_products(products).dedupe()
 
 def save_dataset(products, filename='products.json'):
     """Save products to JSON file"""
     output_path = Path(__file__).parent.parent / 'public' / 'data' / filename
-    output_path.parent.mkdir(parents=True, exist_ok=True)
     
-    # Remove 'source' field for cleaner output
-    clean_products = []
-    for p in products:
-        clean = {k: v for k, v in p.items() if k != 'source'}
-        clean_products.append(clean)
+    # Remove 'source' field for cleaner output; a columnar catalog is
+    # serialized straight from its columns, a plain list is filtered as is
+    if isinstance(products, ColumnarCatalog):
+        clean_products = products.to_products(include_source=False)
+    else:
+        clean_products = [{k: v for k, v in p.items() if k != 'source'} for p in products]
     
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(clean_products, f, indent=2)
+    # Build into a new snapshot, then atomically swap products.json
+    publish_snapshot(clean_products, indexes=build_catalog_indexes(clean_products),
+                     catalog_path=output_path)
     
     print(f"\n✅ Saved {len(clean_products)} products to: {output_path}")
     return output_path
 
 def show_dataset_stats(products):
     """Display statistics about the dataset"""
-    categories = {}
-    sources = {}
-    total_value = 0
-    
-    for p in products:
-        cat = p.get('category', 'Unknown')
-        categories[cat] = categories.get(cat, 0) + 1
-        
-        src = p.get('source', 'Unknown')
-        sources[src] = sources.get(src, 0) + 1
-        
-        total_value += p.get('price', 0)
+    catalog = ColumnarCatalog.from_products(products)
+    categories = catalog.category_counts()
+    sources = catalog.source_counts()
     
     print("\n" + "=" * 60)
     print("📊 DATASET STATISTICS")
     print("=" * 60)
-    print(f"Total products: {len(products)}")
-    print(f"Average price: ${total_value/len(products):.2f}")
+    print(f"Total products: {len(catalog)}")
+    print(f"Average price: ${catalog.average_price():.2f}")
     print(f"\nTop 10 categories:")
     for cat, count in sorted(categories.items(), key=lambda x: -x[1])[:10]:
         print(f"  • {cat}: {count}")
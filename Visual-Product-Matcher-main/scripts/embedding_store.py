@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for loading the catalog and its CLIP embeddings
+Used by the Python search tooling (sharded search, benchmarks)
+
+Embeddings are stored as a float32 matrix, one row per product in the
+same order as the catalog. The current catalog snapshot is preferred so
+catalog and vectors always come from the same build; products.json and a
+loose data/embeddings.npy are the fallback.
+"""
+
+import json
+
+import numpy as np
+
+from catalog_snapshot import DATA_DIR, STORE_DIR, open_snapshot, publish_snapshot
+
+EMBEDDING_DIM = 512  # CLIP ViT-B/32 image embedding size
+
+def load_catalog(filename='products.json'):
+    """Load the product catalog written by save_dataset"""
+    snapshot = open_snapshot()
+    if snapshot is not None and filename == 'products.json':
+        return snapshot.products
+
+    catalog_path = DATA_DIR / filename
+
+    if catalog_path.exists():
+        with open(catalog_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return []
+
+def load_embeddings(filename='embeddings.npy', mmap=True):
+    """Load the embedding matrix aligned with products.json"""
+    name = filename.rsplit('.', 1)[0]
+    snapshot = open_snapshot()
+    if snapshot is not None:
+        # Never mix vectors from loose files with a snapshot's catalog
+        if not snapshot.has_array(name):
+            return None
+        array = snapshot.array(name)
+        return array if mmap else np.array(array)
+
+    embeddings_path = STORE_DIR / filename
+
+    if not embeddings_path.exists():
+        return None
+    return np.load(embeddings_path, mmap_mode='r' if mmap else None)
+
+def save_embeddings(embeddings, products=None):
+    """
+    Publish a new snapshot pairing the catalog with its embeddings
+    PCA-reduced vectors for the coarse search pass and the category
+    routing partitions are stored alongside. 'ids' records the product id
+    of every row, so later catalog edits can carry the vectors forward.
+    """
+    from category_router import build_router_arrays
+    from lexical_index import build_catalog_indexes
+    from pca_reduction import build_reduced_arrays
+
+    products = load_catalog() if products is None else products
+    embeddings = normalize_rows(embeddings)
+
+    if len(embeddings) != len(products):
+        raise ValueError(f"{len(embeddings)} embeddings for {len(products)} products")
+
+    arrays = {'ids': np.array([p['id'] for p in products], dtype=np.int64), 'embeddings': embeddings}
+    arrays.update(build_reduced_arrays(embeddings))
+    arrays.update(build_router_arrays(products, embeddings))
+    row_arrays = ['ids', 'embeddings', 'pca_bias', 'route_partition']
+    row_arrays += [name for name in arrays if name.startswith('reduced_')]
+    return publish_snapshot(products, arrays=arrays, indexes=build_catalog_indexes(products),
+                            row_arrays=row_arrays)
+
+def load_vector_ids(products=None):
+    """
+    Product id for every embedding row; -1 marks a product whose vector
+    has not been computed yet (e.g. added after the last save_embeddings)
+    """
+    snapshot = open_snapshot()
+    if snapshot is not None and snapshot.has_array('ids'):
+        return np.asarray(snapshot.array('ids'))
+    products = load_catalog() if products is None else products
+    return np.array([p['id'] for p in products], dtype=np.int64)
+
+def normalize_rows(vectors):
+    """L2-normalize vectors so dot product equals cosine similarity"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def top_k(scores, k):
+    """Return (indices, scores) of the k highest scores, best first"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    idx = np.argpartition(-scores, k - 1)[:k]
+    idx = idx[np.argsort(-scores[idx])]
+    return idx, scores[idx]
+
+def to_percentage(similarity):
+    """Map cosine similarity to the 0-100 score shown in the app"""
+    return int(round((float(similarity) + 1) / 2 * 100))
+
+def synthetic_embeddings(num_products, dim=EMBEDDING_DIM, num_clusters=50, seed=42):
+    """
+    Generate clustered, normalized embeddings for benchmarking
+    Returns (embeddings, cluster_labels) so callers can fake categories
+    """
+    rng = np.random.default_rng(seed)
+    centers = normalize_rows(rng.standard_normal((num_clusters, dim)))
+    labels = rng.integers(0, num_clusters, size=num_products)
+
+    embeddings = np.empty((num_products, dim), dtype=np.float32)
+    chunk = 100_000
+    for start in range(0, num_products, chunk):
+        end = min(start + chunk, num_products)
+        noise = rng.standard_normal((end - start, dim)).astype(np.float32) * 0.06
+        embeddings[start:end] = normalize_rows(centers[labels[start:end]] + noise)
+
+    return embeddings, labels
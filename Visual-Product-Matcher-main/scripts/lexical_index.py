@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Inverted index over product names with BM25 scoring
+Built whenever a catalog snapshot is published, and used for hybrid
+search: a text hint and/or category (given or predicted from the query
+image) picks a candidate set, and only those products are re-ranked by
+embedding cosine instead of scanning the whole catalog.
+Usage: python scripts/lexical_index.py
+"""
+
+import re
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from category_router import category_centroids
+from embedding_store import (
+    load_catalog, load_embeddings, load_vector_ids, normalize_rows, top_k, synthetic_embeddings,
+)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+DEFAULT_CANDIDATES = 2000  # products re-ranked by embedding per query
+
+def tokenize(text):
+    """Lowercase alphanumeric tokens, dropping single letters"""
+    return [t for t in TOKEN_PATTERN.findall(str(text).lower()) if len(t) > 1 or t.isdigit()]
+
+class InvertedIndex:
+    """
+    Token -> postings (catalog rows + term frequencies) over product names
+
+    Rows are positions in the catalog list, so they line up with the rows
+    of the embedding matrix.
+    """
+
+    def __init__(self, postings, doc_lengths, categories, k1=1.5, b=0.75):
+        self.postings = postings        # token -> (rows int32 array, tf float32 array)
+        self.doc_lengths = doc_lengths  # float32 array, tokens per name
+        self.categories = categories    # category -> rows int32 array
+        self.num_docs = len(doc_lengths)
+        self.avg_length = float(doc_lengths.mean()) if self.num_docs else 0.0
+        self.k1 = k1
+        self.b = b
+
+    @classmethod
+    def build(cls, products):
+        """Tokenize every product name and collect postings and category rows"""
+        postings = defaultdict(lambda: ([], []))
+        categories = defaultdict(list)
+        doc_lengths = np.zeros(len(products), dtype=np.float32)
+
+        for row, product in enumerate(products):
+            tokens = tokenize(product.get('name', ''))
+            doc_lengths[row] = len(tokens)
+            for token, tf in Counter(tokens).items():
+                rows, tfs = postings[token]
+                rows.append(row)
+                tfs.append(tf)
+            categories[product.get('category', 'Unknown')].append(row)
+
+        return cls(
+            {t: (np.array(r, dtype=np.int32), np.array(f, dtype=np.float32)) for t, (r, f) in postings.items()},
+            doc_lengths,
+            {c: np.array(r, dtype=np.int32) for c, r in categories.items()},
+        )
+
+    def to_dict(self):
+        """JSON-serializable form stored in catalog snapshots"""
+        return {
+            'num_docs': self.num_docs,
+            'doc_lengths': self.doc_lengths.astype(int).tolist(),
+            'postings': {t: [r.tolist(), f.astype(int).tolist()] for t, (r, f) in self.postings.items()},
+            'categories': {c: r.tolist() for c, r in self.categories.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            {t: (np.array(r, dtype=np.int32), np.array(f, dtype=np.float32)) for t, (r, f) in data['postings'].items()},
+            np.array(data['doc_lengths'], dtype=np.float32),
+            {c: np.array(r, dtype=np.int32) for c, r in data['categories'].items()},
+        )
+
+    def bm25(self, text):
+        """Return (rows, scores) for every product matching at least one query token"""
+        rows, contributions = [], []
+        for token in set(tokenize(text)):
+            if token not in self.postings:
+                continue
+            token_rows, tf = self.postings[token]
+            idf = np.log(1 + (self.num_docs - len(token_rows) + 0.5) / (len(token_rows) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[token_rows] / self.avg_length)
+            rows.append(token_rows)
+            contributions.append(idf * tf * (self.k1 + 1) / (tf + norm))
+
+        if not rows:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+
+        unique_rows, inverse = np.unique(np.concatenate(rows), return_inverse=True)
+        return unique_rows, np.bincount(inverse, weights=np.concatenate(contributions)).astype(np.float32)
+
+    def search(self, text, k=10):
+        """Plain keyword search: (rows, scores) best first"""
+        rows, scores = self.bm25(text)
+        best, best_scores = top_k(scores, k)
+        return rows[best], best_scores
+
+def build_catalog_indexes(products):
+    """Indexes stored with every published catalog snapshot"""
+    return {'lexical_index': InvertedIndex.build(products).to_dict()}
+
+def load_lexical_index(products=None):
+    """Load the index from the current snapshot, or build it from the catalog"""
+    from catalog_snapshot import open_snapshot
+
+    snapshot = open_snapshot()
+    if snapshot is not None and 'lexical_index' in snapshot.manifest['indexes']:
+        return InvertedIndex.from_dict(snapshot.index('lexical_index'))
+    return InvertedIndex.build(load_catalog() if products is None else products)
+
+class HybridSearch:
+    """
+    Lexical candidate generation followed by embedding re-ranking
+
+        hybrid = HybridSearch(index, embeddings, ids=load_vector_ids())
+        rows, scores, stats = hybrid.search(query, text_hint="running shoes")
+
+    ids is the snapshot's per-row product id array; rows with id -1 have no
+    vector yet and are never returned as candidates.
+    """
+
+    def __init__(self, index, embeddings, ids=None):
+        self.index = index
+        self.embeddings = embeddings
+        self.has_vector = None if ids is None else np.asarray(ids) >= 0
+        self.categories = {c: self._with_vectors(rows) for c, rows in index.categories.items()}
+        predictable = {c: rows for c, rows in self.categories.items() if len(rows)}
+        self.category_names = list(predictable)
+        self.centroids = category_centroids(predictable, embeddings)
+
+    def _with_vectors(self, rows):
+        """Drop rows whose product has no embedding"""
+        return rows if self.has_vector is None else rows[self.has_vector[rows]]
+
+    def predict_category(self, query):
+        """Closest category by cosine to the category mean embedding"""
+        scores = self.centroids @ normalize_rows(query)
+        return self.category_names[int(np.argmax(scores))]
+
+    def candidates(self, query, text_hint=None, category=None, candidate_limit=DEFAULT_CANDIDATES):
+        """
+        Candidate rows for a query
+
+        With a text hint, the top candidate_limit BM25 matches (restricted to
+        the category when one is given). Without one, the whole given or
+        predicted category.
+        """
+        if category is None and not text_hint:
+            category = self.predict_category(query)
+
+        category_rows = self.categories.get(category) if category else None
+
+        if text_hint:
+            rows, scores = self.index.bm25(text_hint)
+            if self.has_vector is not None:
+                keep = self.has_vector[rows]
+                rows, scores = rows[keep], scores[keep]
+            if category_rows is not None:
+                keep = np.isin(rows, category_rows)
+                rows, scores = rows[keep], scores[keep]
+            if len(rows):
+                best, _ = top_k(scores, candidate_limit)
+                return np.sort(rows[best]), category
+
+        if category_rows is None:
+            return self._with_vectors(np.arange(self.index.num_docs, dtype=np.int32)), category
+        return category_rows, category
+
+    def search(self, query, k=10, text_hint=None, category=None, candidate_limit=DEFAULT_CANDIDATES):
+        """Return (rows, similarities, stats) for the top-k products"""
+        start = time.perf_counter()
+        rows, used_category = self.candidates(query, text_hint, category, candidate_limit)
+        candidate_time = time.perf_counter() - start
+
+        scores = np.asarray(self.embeddings[rows]) @ normalize_rows(query)
+        best, best_scores = top_k(scores, k)
+        total_time = time.perf_counter() - start
+
+        stats = {
+            'category': used_category,
+            'candidates': len(rows),
+            'scanned_fraction': len(rows) / max(self.index.num_docs, 1),
+            'candidate_ms': candidate_time * 1000,
+            'total_ms': total_time * 1000,
+        }
+        return rows[best], best_scores, stats
+
+    def full_scan(self, query, k=10):
+        """Exact search over the whole catalog, for comparison"""
+        scores = np.asarray(self.embeddings) @ normalize_rows(query)
+        if self.has_vector is not None:
+            scores[~self.has_vector] = -np.inf
+        return top_k(scores, k)
+
+def synthetic_catalog(num_products, num_categories=50, seed=42):
+    """Products with category-specific name vocabulary plus matching embeddings"""
+    rng = np.random.default_rng(seed)
+    embeddings, labels = synthetic_embeddings(num_products, num_clusters=num_categories, seed=seed)
+    words = [f"item{c}" for c in range(num_categories * 8)]
+
+    products = []
+    for row, label in enumerate(labels):
+        vocab = words[label * 8:(label + 1) * 8]
+        products.append({
+            'id': row + 1,
+            'name': ' '.join(rng.choice(vocab, size=3)),
+            'category': f"Category {label}",
+            'price': 0.0,
+            'image': '',
+        })
+    return products, embeddings
+
+def benchmark_hybrid(num_products=200_000, num_queries=100, k=10, candidate_limits=(500, 2000, 10000)):
+    """Compare hybrid search to a full scan: latency saved and recall@k"""
+    products, embeddings = synthetic_catalog(num_products)
+    hybrid = HybridSearch(InvertedIndex.build(products), embeddings)
+    rng = np.random.default_rng(0)
+    query_rows = rng.integers(0, num_products, num_queries)
+
+    full_ms, truth = 0.0, []
+    for row in query_rows:
+        start = time.perf_counter()
+        best, _ = hybrid.full_scan(embeddings[row], k)
+        full_ms += (time.perf_counter() - start) * 1000
+        truth.append(set(best.tolist()))
+    full_ms /= num_queries
+
+    print(f"\n⏱️  Benchmark: {num_products} products, {num_queries} queries, k={k}")
+    print(f"Full scan: {full_ms:.2f} ms/query")
+    print(f"{'Mode':<22} {'Candidates':>11} {'ms/query':>9} {'Saved':>7} {'Recall':>7}")
+
+    modes = [('predicted category', None, None)]
+    modes += [(f"text hint, top {limit}", limit, True) for limit in candidate_limits]
+
+    report = []
+    for label, limit, use_text in modes:
+        total_ms, recall, candidates = 0.0, 0.0, 0
+        for row, expected in zip(query_rows, truth):
+            hint = products[row]['name'].split()[0] if use_text else None
+            best, _, stats = hybrid.search(embeddings[row], k, text_hint=hint,
+                                           candidate_limit=limit or DEFAULT_CANDIDATES)
+            total_ms += stats['total_ms']
+            candidates += stats['candidates']
+            recall += len(expected & set(best.tolist())) / k
+
+        ms = total_ms / num_queries
+        report.append({'mode': label, 'candidates': candidates / num_queries, 'ms': ms,
+                       'saved_ms': full_ms - ms, 'recall': recall / num_queries})
+        print(f"{label:<22} {candidates / num_queries:>11.0f} {ms:>9.2f} "
+              f"{full_ms - ms:>6.2f}ms {recall / num_queries:>6.1%}")
+
+    return report
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Visual Product Matcher - Lexical + Visual Search")
+    print("=" * 60)
+    print("\nOptions:")
+    print("1. Keyword search over product names")
+    print("2. Hybrid search similar to a catalog product")
+    print("3. Run hybrid vs full-scan benchmark (synthetic data)")
+
+    choice = input("\nEnter choice (1-3) [3]: ").strip() or "3"
+
+    if choice in ("1", "2"):
+        products = load_catalog()
+        index = load_lexical_index(products)
+
+        if choice == "1":
+            text = input("Search text: ").strip()
+            rows, scores = index.search(text, k=10)
+            for row, score in zip(rows, scores):
+                print(f"  {score:6.2f}  {products[row]['name']} ({products[row]['category']})")
+        else:
+            embeddings = load_embeddings()
+            if embeddings is None or len(embeddings) != len(products):
+                print("❌ No embeddings matching the current catalog")
+                exit(1)
+
+            ids = load_vector_ids(products)
+            row = int(input("Catalog row (0-based): ").strip())
+            if ids[row] < 0:
+                print(f"❌ {products[row]['name']} has no embedding yet; run save_embeddings first")
+                exit(1)
+            hint = input("Text hint (optional): ").strip() or None
+            limit = int(input(f"Candidate set size [{DEFAULT_CANDIDATES}]: ").strip() or DEFAULT_CANDIDATES)
+
+            hybrid = HybridSearch(index, embeddings, ids)
+            best, scores, stats = hybrid.search(embeddings[row], k=10, text_hint=hint, candidate_limit=limit)
+            print(f"\n🔍 Similar to: {products[row]['name']}")
+            for r, score in zip(best, scores):
+                print(f"  {score:.3f}  {products[r]['name']}")
+            print(f"\nScanned {stats['candidates']} products ({stats['scanned_fraction']:.1%}) "
+                  f"in {stats['total_ms']:.2f} ms")
+    elif choice == "3":
+        benchmark_hybrid()
+    else:
+        print("❌ Invalid choice")
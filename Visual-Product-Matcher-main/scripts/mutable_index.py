@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Vector index with online upserts and deletes for live catalog edits
+Queries scan a large immutable main segment plus a small append-only delta
+segment. Deletes and overwritten rows are hidden with tombstone bitmaps,
+and a background thread compacts both segments into a new main segment
+once the delta or the deleted fraction passes a threshold.
+Usage: python scripts/mutable_index.py
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from embedding_store import normalize_rows, top_k, synthetic_embeddings
+
+MAX_DELTA_ROWS = 50_000        # merge once the delta segment holds this many rows
+MAX_DELETED_FRACTION = 0.1     # ...or once this fraction of all rows is tombstoned
+MERGE_CHECK_INTERVAL = 1.0     # seconds between background threshold checks
+
+class Segment:
+    """
+    Immutable rows of (id, vector) plus a tombstone bitmap
+
+    The id and vector arrays are used as given (e.g. memory-mapped from a
+    snapshot), never copied; only the tombstone bitmap is allocated, plus a
+    sort order for id lookups when the ids are not already sorted.
+    """
+
+    def __init__(self, ids, vectors):
+        self.ids = ids
+        self.vectors = vectors
+        self.tombstones = np.zeros(len(ids), dtype=bool)
+        self.count = len(ids)
+
+        ids = np.asarray(ids)
+        if len(ids) < 2 or (ids[1:] >= ids[:-1]).all():
+            self._order, self._sorted_ids = None, ids
+        else:
+            self._order = np.argsort(ids, kind='stable')
+            self._sorted_ids = ids[self._order]
+
+    def find(self, product_id):
+        """Row holding product_id (binary search over the ids), or None"""
+        pos = int(np.searchsorted(self._sorted_ids, product_id))
+        if pos == len(self._sorted_ids) or self._sorted_ids[pos] != product_id:
+            return None
+        return pos if self._order is None else int(self._order[pos])
+
+    def view(self):
+        """Buffers and row count as of now, for a lock-free scan"""
+        return self.ids, self.vectors, self.tombstones, self.count
+
+    def live_rows(self):
+        return np.flatnonzero(~self.tombstones[:self.count])
+
+class DeltaSegment(Segment):
+    """
+    Append-only segment for upserts; buffers grow by doubling
+    Ids are looked up through MutableIndex.delta_rows rather than find()
+    """
+
+    def __init__(self, dim, capacity=1024):
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.tombstones = np.zeros(capacity, dtype=bool)
+        self.count = 0
+
+    def append(self, product_id, vector):
+        """Append a row, returning its row number"""
+        if self.count == len(self.ids):
+            capacity = 2 * len(self.ids)
+            ids = np.zeros(capacity, dtype=np.int64)
+            vectors = np.zeros((capacity, self.vectors.shape[1]), dtype=np.float32)
+            tombstones = np.zeros(capacity, dtype=bool)
+            ids[:self.count] = self.ids[:self.count]
+            vectors[:self.count] = self.vectors[:self.count]
+            tombstones[:self.count] = self.tombstones[:self.count]
+            # Readers holding the old buffers keep a valid (older) view
+            self.ids, self.vectors, self.tombstones = ids, vectors, tombstones
+
+        row = self.count
+        self.ids[row] = product_id
+        self.vectors[row] = vector
+        self.count = row + 1
+        return row
+
+def _scan(view, query, k):
+    """Top-k (similarity, product_id) pairs among live rows of a segment view"""
+    ids, vectors, tombstones, count = view
+    if count == 0:
+        return []
+    scores = vectors[:count] @ query
+    scores[tombstones[:count]] = -np.inf
+    rows, best = top_k(scores, k)
+    return [(float(s), int(ids[r])) for r, s in zip(rows, best) if s > -np.inf]
+
+class MutableIndex:
+    """
+    Main + delta segment index with tombstones and background compaction
+
+        with MutableIndex(ids, embeddings) as index:
+            index.upsert(1001, embedding)    # searchable immediately
+            index.delete(42)
+            results = index.search(query, k=10)
+    """
+
+    def __init__(self, ids, embeddings, normalized=True, max_delta_rows=MAX_DELTA_ROWS,
+                 max_deleted_fraction=MAX_DELETED_FRACTION, check_interval=MERGE_CHECK_INTERVAL):
+        # Already-normalized embeddings (as save_embeddings stores them) are
+        # served in place, so a memory-mapped matrix is never loaded whole
+        if not normalized:
+            embeddings = normalize_rows(embeddings)
+        self.dim = embeddings.shape[1]
+        self.main = Segment(np.asarray(ids), embeddings)
+        self.delta = DeltaSegment(self.dim)
+
+        # Rows with id -1 have no vector yet (see load_vector_ids) and stay hidden
+        missing = np.asarray(self.main.ids) < 0
+        self.main.tombstones[missing] = True
+        self.deleted = int(missing.sum())
+        self.main_live = self.main.count - self.deleted
+        # Main rows are found by binary search over their ids; only the
+        # small delta keeps a dict (product id -> live delta row)
+        self.delta_rows = {}
+
+        self.max_delta_rows = max_delta_rows
+        self.max_deleted_fraction = max_deleted_fraction
+        self.check_interval = check_interval
+        self.merges = 0
+
+        self._lock = threading.Lock()        # guards segment swaps and writes
+        self._merge_lock = threading.Lock()  # one compaction at a time
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_snapshot(cls, snapshot, **kwargs):
+        """Serve a published snapshot's memory-mapped ids and embeddings"""
+        return cls(snapshot.array('ids'), snapshot.array('embeddings'), **kwargs)
+
+    def __len__(self):
+        return self.main_live + len(self.delta_rows)
+
+    def _tombstone(self, product_id):
+        row = self.delta_rows.pop(product_id, None)
+        if row is not None:
+            self.delta.tombstones[row] = True
+        else:
+            row = self.main.find(product_id)
+            if row is None or self.main.tombstones[row]:
+                return False
+            self.main.tombstones[row] = True
+            self.main_live -= 1
+        self.deleted += 1
+        return True
+
+    # ---- writes ----
+
+    def upsert(self, product_id, embedding):
+        """Insert or replace a product's vector; visible to the next query"""
+        vector = normalize_rows(embedding).reshape(-1)
+        with self._lock:
+            self._tombstone(int(product_id))
+            self.delta_rows[int(product_id)] = self.delta.append(int(product_id), vector)
+
+    def delete(self, product_id):
+        """Hide a product from search; returns False if it was not indexed"""
+        with self._lock:
+            return self._tombstone(int(product_id))
+
+    # ---- reads ----
+
+    def search(self, query, k=10):
+        """Top-k (product_id, similarity) pairs across both segments"""
+        query = normalize_rows(query).reshape(-1)
+        with self._lock:
+            main_view, delta_view = self.main.view(), self.delta.view()
+
+        hits = _scan(main_view, query, k) + _scan(delta_view, query, k)
+        hits.sort(reverse=True)
+        return [(product_id, score) for score, product_id in hits[:k]]
+
+    # ---- compaction ----
+
+    def needs_merge(self):
+        total = self.main.count + self.delta.count
+        return (self.delta.count >= self.max_delta_rows
+                or (total and self.deleted / total >= self.max_deleted_fraction))
+
+    def merge(self):
+        """
+        Compact live rows of main + delta into a new main segment
+
+        The copy and the new segment are built without the write lock, so
+        queries and upserts continue. Under the lock only the tombstones are
+        re-read (deletes that happened meanwhile) and rows appended to the
+        delta meanwhile move to a fresh delta.
+        """
+        with self._merge_lock:
+            self._commit_merge(self._prepare_merge())
+
+    def _prepare_merge(self):
+        """Copy the live rows into a new main segment; the lock is held only to take views"""
+        with self._lock:
+            main = self.main
+            delta_ids, delta_vectors, delta_tombstones, delta_count = self.delta.view()
+            main_rows = main.live_rows()
+            delta_rows = np.flatnonzero(~delta_tombstones[:delta_count])
+
+        ids = np.concatenate([main.ids[main_rows], delta_ids[delta_rows]])
+        vectors = np.concatenate([main.vectors[main_rows], delta_vectors[delta_rows]])
+        return main, main_rows, delta_rows, delta_count, Segment(ids, vectors)
+
+    def _commit_merge(self, plan):
+        """Carry over edits made since _prepare_merge and swap in the new segments"""
+        main, main_rows, delta_rows, delta_count, merged = plan
+        with self._lock:
+            # Delta buffers may have been regrown since; read the current ones
+            merged.tombstones[:] = np.concatenate([main.tombstones[main_rows],
+                                                   self.delta.tombstones[delta_rows]])
+
+            tail, tail_rows = DeltaSegment(self.dim), {}
+            for row in range(delta_count, self.delta.count):
+                pid = int(self.delta.ids[row])
+                new_row = tail.append(pid, self.delta.vectors[row])
+                if self.delta.tombstones[row]:
+                    tail.tombstones[new_row] = True
+                else:
+                    tail_rows[pid] = new_row
+
+            self.main, self.delta, self.delta_rows = merged, tail, tail_rows
+            merged_deleted = int(merged.tombstones.sum())
+            self.main_live = merged.count - merged_deleted
+            self.deleted = merged_deleted + int(tail.tombstones[:tail.count].sum())
+            self.merges += 1
+
+    def _merge_loop(self):
+        while not self._stop.wait(self.check_interval):
+            if self.needs_merge():
+                self.merge()
+
+    def start(self):
+        """Start the background merge thread"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._merge_loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        """Stop the background merge thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+def check_merge_edits():
+    """
+    Deterministic check of edits that land while a merge is in flight
+
+    Between building the new main segment and swapping it in, a main row
+    is upserted, a delta row is deleted and one product is upserted twice.
+    Live count and search results are checked before the swap, after it and
+    after a second, clean merge.
+    """
+    basis = np.eye(16, dtype=np.float32)
+    index = MutableIndex(np.array([5, 1, 4, 2, 6, 3]), basis[[5, 1, 4, 2, 6, 3]])
+    index.upsert(100, basis[10])   # lives in the delta when the merge starts
+
+    def top(query, k=1):
+        return [(pid, round(score, 3)) for pid, score in index.search(query, k)]
+
+    def verify(stage):
+        assert len(index) == 6, f"{stage}: {len(index)} live products, expected 6"
+        assert top(basis[12]) == [(2, 1.0)], f"{stage}: upserted main row not found"
+        assert all(score < 0.5 for _, score in index.search(basis[2], 16)), f"{stage}: stale main row visible"
+        assert all(pid != 100 for pid, _ in index.search(basis[10], 16)), f"{stage}: deleted delta row visible"
+        assert top(basis[14]) == [(3, 1.0)], f"{stage}: last upsert of product 3 not found"
+        assert all(score < 0.5 for _, score in index.search(basis[13], 16)), f"{stage}: first re-upsert visible"
+        hits = [pid for pid, _ in index.search(basis[0], 16)]
+        assert len(hits) == len(set(hits)) == 6, f"{stage}: duplicate or missing products {hits}"
+
+    plan = index._prepare_merge()
+    index.upsert(2, basis[12])     # upsert of a main row
+    assert index.delete(100)       # delete of a delta row
+    index.upsert(3, basis[13])     # re-upsert twice
+    index.upsert(3, basis[14])
+    verify("during merge")
+    index._commit_merge(plan)
+    verify("after merge")
+
+    index.merge()
+    verify("after second merge")
+    assert index.deleted == 0 and index.delta.count == 0
+
+    print("✅ Merge check passed: main upsert, delta delete and double re-upsert during a merge")
+
+def benchmark_live_edits(num_products=200_000, num_upserts=20_000, num_deletes=20_000, k=10):
+    """Stream edits while querying; report visibility delay, query latency and merges"""
+    embeddings, _ = synthetic_embeddings(num_products + num_upserts)
+    rng = np.random.default_rng(0)
+
+    index = MutableIndex(np.arange(1, num_products + 1), embeddings[:num_products],
+                         max_delta_rows=5_000, check_interval=0.1)
+    latencies = []
+    stop = threading.Event()
+
+    def query_loop():
+        while not stop.is_set():
+            query = embeddings[rng.integers(0, num_products)]
+            start = time.perf_counter()
+            index.search(query, k)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    with index:
+        reader = threading.Thread(target=query_loop)
+        reader.start()
+
+        visible_ms = []
+        for i in range(num_upserts):
+            product_id = num_products + i + 1
+            start = time.perf_counter()
+            index.upsert(product_id, embeddings[num_products + i])
+            if i % 1000 == 0:
+                assert index.search(embeddings[num_products + i], 1)[0][0] == product_id
+                visible_ms.append((time.perf_counter() - start) * 1000)
+
+        deleted_ids = rng.choice(np.arange(1, num_products + 1), num_deletes, replace=False)
+        for product_id in deleted_ids:
+            index.delete(product_id)
+        hits = index.search(embeddings[deleted_ids[0] - 1], k)
+        assert all(pid != deleted_ids[0] for pid, _ in hits)
+
+        time.sleep(0.5)
+        stop.set()
+        reader.join()
+
+    print(f"\n⏱️  Live edits: {num_products} products, +{num_upserts} upserts, -{num_deletes} deletes")
+    print(f"Upsert → searchable: {np.mean(visible_ms):.2f} ms (avg)")
+    print(f"Query latency during edits: p50 {np.percentile(latencies, 50):.2f} ms, "
+          f"p99 {np.percentile(latencies, 99):.2f} ms ({len(latencies)} queries)")
+    print(f"Background merges: {index.merges}, live products: {len(index)}")
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Visual Product Matcher - Live Index Updates")
+    print("=" * 60)
+    print("\nOptions:")
+    print("1. Run live edit benchmark (synthetic data)")
+    print("2. Check edits made during a merge")
+
+    choice = input("\nEnter choice (1-2) [1]: ").strip() or "1"
+
+    if choice == "1":
+        benchmark_live_edits()
+    elif choice == "2":
+        check_merge_edits()
+    else:
+        print("❌ Invalid choice")
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+PCA-reduced embeddings for a cheap coarse pass before exact re-ranking
+A PCA projection is fitted on the catalog embeddings and 64/128-d reduced
+vectors are stored in the snapshot next to the full 512-d ones. Search
+scans the reduced vectors, then re-ranks the best few hundred candidates
+with the full vectors.
+Usage: python scripts/pca_reduction.py
+"""
+
+import time
+
+import numpy as np
+
+from embedding_store import (
+    load_catalog, load_embeddings, load_vector_ids, normalize_rows, top_k, synthetic_embeddings,
+)
+
+REDUCED_DIMS = (64, 128)
+DEFAULT_RERANK = 300  # candidates re-ranked with full vectors
+
+def fit_pca(embeddings, chunk=100_000):
+    """
+    Fit PCA from the covariance matrix, accumulated in chunks so the full
+    matrix never has to be copied into memory at once
+    Returns (mean, components) with components sorted by explained variance
+    """
+    n, dim = embeddings.shape
+    total = np.zeros(dim, dtype=np.float64)
+    gram = np.zeros((dim, dim), dtype=np.float64)
+
+    for start in range(0, n, chunk):
+        block = np.asarray(embeddings[start:start + chunk], dtype=np.float64)
+        total += block.sum(axis=0)
+        gram += block.T @ block
+
+    mean = total / n
+    covariance = gram / n - np.outer(mean, mean)
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+    order = np.argsort(eigenvalues)[::-1]
+    return mean.astype(np.float32), eigenvectors[:, order].T.astype(np.float32)
+
+def project(vectors, mean, components, dims):
+    """Project (normalized) vectors onto the first dims principal directions"""
+    return ((normalize_rows(vectors) - mean) @ components[:dims].T).astype(np.float32)
+
+def build_reduced_arrays(embeddings, dims=REDUCED_DIMS, chunk=100_000):
+    """
+    Arrays stored in a snapshot next to the full embeddings
+
+    For normalized x and q, x.q = (x-m).(q-m) + m.x + m.q - m.m, so keeping
+    'pca_bias' = m.x per product makes the coarse score exact up to the
+    dropped dimensions (m.q - m.m is constant per query and ignored).
+    """
+    mean, components = fit_pca(embeddings, chunk)
+    arrays = {'pca_mean': mean, 'pca_components': components[:max(dims)]}
+
+    reduced = {d: np.empty((len(embeddings), d), dtype=np.float32) for d in dims}
+    bias = np.empty(len(embeddings), dtype=np.float32)
+    for start in range(0, len(embeddings), chunk):
+        block = normalize_rows(embeddings[start:start + chunk])
+        projected = project(block, mean, components, max(dims))
+        for d in dims:
+            reduced[d][start:start + len(block)] = projected[:, :d]
+        bias[start:start + len(block)] = block @ mean
+
+    arrays.update({f"reduced_{d}": reduced[d] for d in dims})
+    arrays['pca_bias'] = bias
+    return arrays
+
+class TwoStageSearch:
+    """
+    Coarse scan on reduced vectors, exact re-rank on full vectors
+
+        search = TwoStageSearch.from_arrays(embeddings, build_reduced_arrays(embeddings), dims=64)
+        rows, scores, stats = search.search(query, k=10)
+
+    Rows whose id is -1 (no vector yet) are excluded from the coarse pass.
+    """
+
+    def __init__(self, embeddings, reduced, bias, mean, components, ids=None):
+        self.embeddings = embeddings
+        self.reduced = reduced
+        self.bias = bias
+        self.mean = mean
+        self.components = components
+        self.dims = reduced.shape[1]
+        self.missing = None if ids is None else np.flatnonzero(np.asarray(ids) < 0)
+
+    @classmethod
+    def from_arrays(cls, embeddings, arrays, dims=64):
+        return cls(embeddings, arrays[f"reduced_{dims}"], arrays['pca_bias'],
+                   arrays['pca_mean'], arrays['pca_components'], arrays.get('ids'))
+
+    @classmethod
+    def from_snapshot(cls, snapshot, dims=64):
+        names = [f"reduced_{dims}", 'pca_bias', 'pca_mean', 'pca_components']
+        names += ['ids'] if snapshot.has_array('ids') else []
+        arrays = {name: snapshot.array(name) for name in names}
+        return cls.from_arrays(snapshot.array('embeddings'), arrays, dims)
+
+    def search(self, query, k=10, rerank=DEFAULT_RERANK):
+        """Return (rows, similarities, stats) for the top-k products"""
+        start = time.perf_counter()
+        query = normalize_rows(query)
+        coarse = np.asarray(self.reduced) @ project(query, self.mean, self.components, self.dims)
+        coarse += self.bias
+        if self.missing is not None and len(self.missing):
+            coarse[self.missing] = -np.inf
+        candidates, _ = top_k(coarse, max(rerank, k))
+        candidates = candidates[coarse[candidates] > -np.inf]
+        coarse_time = time.perf_counter() - start
+
+        candidates.sort()  # sequential reads from the full matrix
+        exact = np.asarray(self.embeddings[candidates]) @ query
+        best, scores = top_k(exact, k)
+        total_time = time.perf_counter() - start
+
+        stats = {
+            'coarse_bytes': self.reduced.nbytes + self.bias.nbytes,
+            'full_bytes': self.embeddings.nbytes,
+            'coarse_ms': coarse_time * 1000,
+            'total_ms': total_time * 1000,
+        }
+        return candidates[best], scores, stats
+
+def recall_harness(embeddings=None, dims=(32, 64, 128, 256), rerank_sizes=(100, 300, 1000),
+                   num_queries=200, k=10):
+    """Report recall@k, coarse-pass size and latency for each reduced dimension"""
+    if embeddings is None:
+        embeddings, _ = synthetic_embeddings(200_000)
+    embeddings = normalize_rows(embeddings)
+    arrays = build_reduced_arrays(embeddings, dims)
+    query_rows = np.random.default_rng(0).integers(0, len(embeddings), num_queries)
+
+    start = time.perf_counter()
+    truth = [set(top_k(embeddings @ embeddings[row], k)[0].tolist()) for row in query_rows]
+    full_ms = (time.perf_counter() - start) * 1000 / num_queries
+
+    print(f"\n⏱️  Recall harness: {len(embeddings)} products, {num_queries} queries, k={k}")
+    print(f"Full scan: {embeddings.nbytes / 1e6:.1f} MB, {full_ms:.2f} ms/query")
+    print(f"{'Dims':>5} {'Re-rank':>8} {'Coarse MB':>10} {'Shrink':>7} {'ms/query':>9} {'Recall':>7}")
+
+    report = []
+    for d in dims:
+        search = TwoStageSearch.from_arrays(embeddings, arrays, d)
+        for rerank in rerank_sizes:
+            recall, total_ms = 0.0, 0.0
+            for row, expected in zip(query_rows, truth):
+                rows, _, stats = search.search(embeddings[row], k, rerank)
+                recall += len(expected & set(rows.tolist())) / k
+                total_ms += stats['total_ms']
+
+            shrink = stats['full_bytes'] / stats['coarse_bytes']
+            report.append({'dims': d, 'rerank': rerank, 'coarse_mb': stats['coarse_bytes'] / 1e6,
+                           'shrink': shrink, 'ms': total_ms / num_queries, 'recall': recall / num_queries})
+            print(f"{d:>5} {rerank:>8} {stats['coarse_bytes'] / 1e6:>10.1f} {shrink:>6.1f}x "
+                  f"{total_ms / num_queries:>9.2f} {recall / num_queries:>6.1%}")
+
+    return report
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Visual Product Matcher - PCA Coarse Search")
+    print("=" * 60)
+    print("\nOptions:")
+    print("1. Run recall harness on catalog embeddings")
+    print("2. Run recall harness on synthetic data")
+
+    choice = input("\nEnter choice (1-2) [2]: ").strip() or "2"
+
+    if choice == "1":
+        products = load_catalog()
+        embeddings = load_embeddings()
+        if embeddings is None or len(embeddings) != len(products):
+            print("❌ No embeddings matching the current catalog")
+            exit(1)
+        # Products added since the last save_embeddings have no vector yet
+        recall_harness(np.asarray(embeddings)[load_vector_ids(products) >= 0])
+    elif choice == "2":
+        recall_harness()
+    else:
+        print("❌ Invalid choice")
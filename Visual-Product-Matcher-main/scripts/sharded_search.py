@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Scatter-gather similarity search across catalog shards
+Each shard is served by its own worker process; a coordinator fans out
+every query and merges the per-shard top-K results with a heap.
+Usage: python scripts/sharded_search.py
+"""
+
+import heapq
+import json
+import multiprocessing as mp
+import os
+import queue
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from catalog_snapshot import write_json_atomic
+from embedding_store import (
+    STORE_DIR, load_catalog, load_embeddings, load_vector_ids, normalize_rows, top_k,
+    to_percentage, synthetic_embeddings,
+)
+
+SHARDS_DIR = STORE_DIR / 'shards'
+DEFAULT_TIMEOUT = 2.0  # seconds to wait for every shard before returning partial results
+STARTUP_TIMEOUT = 30.0  # seconds for every worker to spawn and load its shard
+# One BLAS thread per worker: N workers with a thread per core each would
+# oversubscribe the CPU, so parallelism comes from the shard count alone
+WORKER_THREAD_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS')
+
+def split_into_shards(embeddings, ids, num_shards, output_dir=SHARDS_DIR, verbose=True):
+    """
+    Split an embedding matrix into contiguous shards saved as .npy files
+    Rows with id -1 (products still waiting for an embedding) are skipped
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    ids = np.asarray(ids, dtype=np.int64)
+    keep = ids >= 0
+    if not keep.all():
+        embeddings, ids = np.asarray(embeddings)[keep], ids[keep]
+    embeddings = normalize_rows(embeddings)
+    bounds = np.linspace(0, len(ids), num_shards + 1).astype(int)
+
+    shards = []
+    for shard_idx in range(num_shards):
+        start, end = bounds[shard_idx], bounds[shard_idx + 1]
+        vectors_file = f"shard_{shard_idx:03d}.npy"
+        ids_file = f"shard_{shard_idx:03d}_ids.npy"
+        np.save(output_dir / vectors_file, embeddings[start:end])
+        np.save(output_dir / ids_file, ids[start:end])
+        shards.append({'vectors': vectors_file, 'ids': ids_file, 'size': int(end - start)})
+
+    write_json_atomic(output_dir / 'shards.json', {'num_shards': num_shards, 'shards': shards}, indent=2)
+
+    if verbose:
+        print(f"✅ Wrote {num_shards} shards ({len(ids)} products) to: {output_dir}")
+    return output_dir
+
+def load_shard_paths(shards_dir=SHARDS_DIR):
+    """Read shards.json and return (vectors_path, ids_path) per shard"""
+    shards_dir = Path(shards_dir)
+    with open(shards_dir / 'shards.json', 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    return [(shards_dir / s['vectors'], shards_dir / s['ids']) for s in manifest['shards']]
+
+def _shard_worker(shard_idx, vectors_path, ids_path, requests, responses):
+    """Worker loop: score each incoming query batch against one shard"""
+    vectors = np.load(vectors_path, mmap_mode='r')
+    ids = np.load(ids_path)
+    responses.put(('ready', shard_idx, None, None))
+
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+
+        query_id, queries, k = request
+        scores = np.asarray(queries @ vectors.T)
+        results = []
+        for row in scores:
+            idx, best = top_k(row, k)
+            results.append(list(zip(best.tolist(), ids[idx].tolist())))
+        responses.put(('result', shard_idx, query_id, results))
+
+class ShardedSearch:
+    """
+    Coordinator for a set of shard worker processes
+
+    Use as a context manager so workers are always shut down:
+        with ShardedSearch(load_shard_paths()) as search:
+            result = search.search(query_embedding, k=10)
+    """
+
+    def __init__(self, shard_paths, timeout=DEFAULT_TIMEOUT, startup_timeout=STARTUP_TIMEOUT):
+        self.shard_paths = list(shard_paths)
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+        self._ctx = mp.get_context('spawn')
+        self._responses = self._ctx.Queue()
+        self._requests = []
+        self._workers = []
+        self._ready = set()
+        self._next_query_id = 0
+
+    def start(self):
+        """
+        Spawn one worker per shard and wait until each has loaded its data
+
+        Shards whose worker exits or misses startup_timeout are left out and
+        reported as missing by every search; if no shard comes up at all,
+        RuntimeError is raised.
+        """
+        # Spawned workers inherit the environment, so BLAS reads this on import
+        saved_env = {name: os.environ.get(name) for name in WORKER_THREAD_VARS}
+        os.environ.update({name: '1' for name in WORKER_THREAD_VARS})
+        try:
+            for shard_idx, (vectors_path, ids_path) in enumerate(self.shard_paths):
+                requests = self._ctx.Queue()
+                worker = self._ctx.Process(
+                    target=_shard_worker,
+                    args=(shard_idx, str(vectors_path), str(ids_path), requests, self._responses),
+                    daemon=True,
+                )
+                worker.start()
+                self._requests.append(requests)
+                self._workers.append(worker)
+        finally:
+            for name, value in saved_env.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+        deadline = time.monotonic() + self.startup_timeout
+        pending = set(range(len(self._workers)))
+        while pending:
+            pending -= {i for i in pending if not self._workers[i].is_alive()}
+            remaining = deadline - time.monotonic()
+            if not pending or remaining <= 0:
+                break
+            try:
+                kind, shard_idx, _, _ = self._responses.get(timeout=min(remaining, 0.5))
+            except queue.Empty:
+                continue
+            if kind == 'ready':
+                self._ready.add(shard_idx)
+                pending.discard(shard_idx)
+
+        failed = sorted(set(range(len(self._workers))) - self._ready)
+        if failed:
+            exit_codes = {i: self._workers[i].exitcode for i in failed}
+            if not self._ready:
+                self.close()
+                raise RuntimeError(f"No shard worker started (exit codes: {exit_codes})")
+            print(f"⚠️  Shards {failed} failed to start (exit codes: {exit_codes}); results will be partial")
+        return self
+
+    def close(self):
+        """Stop all workers"""
+        for requests in self._requests:
+            requests.put(None)
+        for worker in self._workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        self._requests, self._workers, self._ready = [], [], set()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def search_batch(self, queries, k=10, timeout=None):
+        """
+        Fan a batch of queries out to every shard and merge the top-K
+
+        Returns one dict per query with 'results' as (product_id, similarity)
+        pairs, plus which shards answered; 'partial' is True when a shard
+        missed the deadline and its products were left out.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        queries = normalize_rows(np.atleast_2d(queries))
+        query_id = self._next_query_id
+        self._next_query_id += 1
+
+        # A worker that died since startup would never answer
+        sent = {i for i in self._ready if self._workers[i].is_alive()}
+        for shard_idx in sent:
+            self._requests[shard_idx].put((query_id, queries, k))
+
+        per_shard = {}
+        late_starters = set()
+        deadline = time.monotonic() + timeout
+        while len(per_shard) < len(sent):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                kind, shard_idx, response_id, results = self._responses.get(timeout=remaining)
+            except queue.Empty:
+                break
+            # Late answers from an earlier, timed-out query are dropped
+            if kind == 'result' and response_id == query_id:
+                per_shard[shard_idx] = results
+            elif kind == 'ready':
+                late_starters.add(shard_idx)  # never sent this query; used from the next one on
+        self._ready = sent | late_starters
+
+        answered = sorted(per_shard)
+        missing = [i for i in range(len(self._requests)) if i not in per_shard]
+
+        merged = []
+        for q in range(len(queries)):
+            candidates = heapq.nlargest(k, (hit for shard in answered for hit in per_shard[shard][q]))
+            merged.append({
+                'results': [(product_id, score) for score, product_id in candidates],
+                'shards_answered': answered,
+                'shards_missing': missing,
+                'partial': bool(missing),
+            })
+        return merged
+
+    def search(self, query, k=10, timeout=None):
+        """Search a single query embedding"""
+        return self.search_batch(query, k=k, timeout=timeout)[0]
+
+def benchmark_scaling(num_products=200_000, shard_counts=(1, 2, 4, 8), num_queries=256,
+                      batch_size=32, k=10, output_dir=None):
+    """
+    Measure query throughput as the shard count grows
+
+    The reference is the same batches scored in this process against the
+    whole in-memory matrix. Workers run one BLAS thread each, so throughput
+    scales with shard count only up to the number of free cores.
+    """
+    output_dir = Path(output_dir or tempfile.mkdtemp(prefix='shards_benchmark_'))
+    embeddings, _ = synthetic_embeddings(num_products)
+    ids = np.arange(1, num_products + 1)
+    queries = embeddings[np.random.default_rng(0).integers(0, num_products, num_queries)]
+
+    print(f"\n⏱️  Benchmark: {num_products} products, {num_queries} queries, "
+          f"{mp.cpu_count()} CPU core(s)")
+    print(f"{'Shards':>8} {'QPS':>10} {'Speedup':>9} {'Partial':>8}")
+
+    start = time.perf_counter()
+    for offset in range(0, num_queries, batch_size):
+        for row in queries[offset:offset + batch_size] @ embeddings.T:
+            top_k(row, k)
+    baseline = num_queries / (time.perf_counter() - start)
+    print(f"{'local':>8} {baseline:>10.1f} {1:>8.2f}x {'-':>8}")
+
+    report = [{'shards': 0, 'qps': baseline, 'speedup': 1.0, 'partial': 0}]
+    for num_shards in shard_counts:
+        shard_dir = split_into_shards(embeddings, ids, num_shards, output_dir / f"n{num_shards}",
+                                       verbose=False)
+        with ShardedSearch(load_shard_paths(shard_dir), timeout=60) as search:
+            search.search_batch(queries[:batch_size], k=k)  # warm-up
+
+            partial = 0
+            start = time.perf_counter()
+            for offset in range(0, num_queries, batch_size):
+                for result in search.search_batch(queries[offset:offset + batch_size], k=k):
+                    partial += result['partial']
+            elapsed = time.perf_counter() - start
+
+        qps = num_queries / elapsed
+        report.append({'shards': num_shards, 'qps': qps, 'speedup': qps / baseline, 'partial': partial})
+        print(f"{num_shards:>8} {qps:>10.1f} {qps / baseline:>8.2f}x {partial:>8}")
+
+    return report
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Visual Product Matcher - Sharded Search")
+    print("=" * 60)
+    print("\nOptions:")
+    print("1. Split catalog embeddings into shards")
+    print("2. Find products similar to a catalog product")
+    print("3. Run shard scaling benchmark (synthetic data)")
+
+    choice = input("\nEnter choice (1-3) [3]: ").strip() or "3"
+
+    if choice in ("1", "2"):
+        products = load_catalog()
+        embeddings = load_embeddings()
+        if embeddings is None or len(embeddings) != len(products):
+            print("❌ No embeddings matching the current catalog "
+                  "(snapshot or data/embeddings.npy); run save_embeddings first")
+            exit(1)
+
+        if choice == "1":
+            num_shards = int(input("Number of shards [4]: ").strip() or 4)
+            split_into_shards(embeddings, load_vector_ids(products), num_shards)
+        else:
+            product_id = int(input("Product ID: ").strip())
+            by_id = {p['id']: (row, p) for row, p in enumerate(products)}
+            if product_id not in by_id:
+                print(f"❌ Unknown product ID: {product_id}")
+                exit(1)
+
+            row, product = by_id[product_id]
+            if load_vector_ids(products)[row] < 0:
+                print(f"❌ {product['name']} has no embedding yet; run save_embeddings first")
+                exit(1)
+            with ShardedSearch(load_shard_paths()) as search:
+                result = search.search(embeddings[row], k=11)
+
+            print(f"\n🔍 Similar to: {product['name']}")
+            for similar_id, score in result['results']:
+                if similar_id != product_id:
+                    print(f"  {to_percentage(score):>3}%  {by_id[similar_id][1]['name']}")
+            if result['partial']:
+                print(f"\n⚠️  Partial results: shards {result['shards_missing']} timed out")
+    elif choice == "3":
+        benchmark_scaling()
+    else:
+        print("❌ Invalid choice")